@@ -1,5 +1,7 @@
 import argparse
+import functools
 import logging
+import os
 import threading
 import signal
 import sys
@@ -12,15 +14,12 @@ import mido
 from pylsl import resolve_streams, StreamInlet
 from scipy.signal import butter, lfilter, lfilter_zi
 
-from PyQt5 import QtWidgets, QtCore
-import pyqtgraph as pg
-
 
 # -----------------------------------------------------
 # MIDI output handler
 # -----------------------------------------------------
 class MidiOut:
-    def __init__(self, port_name):
+    def __init__(self, port_name, velocity=100):
         try:
             self.outport = mido.open_output(port_name)
         except IOError as e:
@@ -29,40 +28,61 @@ class MidiOut:
                 f"Available ports: {mido.get_output_names()}"
             ) from e
 
-    def note_on(self, note, velocity):
-        self.outport.send(mido.Message("note_on", note=int(note), velocity=int(velocity)))
+        # Prebuilt messages for every note, so sending never allocates
+        self._note_on = [mido.Message("note_on", note=n, velocity=int(velocity)) for n in range(128)]
+        self._note_off = [mido.Message("note_off", note=n) for n in range(128)]
+
+    # note must be a Python int (0-127); callers convert NumPy values with tolist()
+    def note_on(self, note):
+        self.outport.send(self._note_on[note])
 
     def note_off(self, note):
-        self.outport.send(mido.Message("note_off", note=int(note)))
+        self.outport.send(self._note_off[note])
 
 
 # -----------------------------------------------------
 # Respiration low-pass filter
 # -----------------------------------------------------
+@functools.lru_cache(maxsize=16)
+def _design(fs, cutoff, order=2):
+    """Butterworth low-pass coefficients and initial state, cached per design."""
+    nyq = 0.5 * fs
+    norm = cutoff / nyq
+    b, a = butter(order, norm, btype="low")
+    return b, a, lfilter_zi(b, a)
+
+
 class RespFilter:
     """Simple real-time low-pass filter for smoothing respiration amplitude."""
 
     def __init__(self, fs, cutoff=1.0):
-        nyq = 0.5 * fs
-        norm = cutoff / nyq
-        self.b, self.a = butter(2, norm, btype="low")
-        zi = lfilter_zi(self.b, self.a)
+        self.b, self.a, zi = _design(float(fs), float(cutoff))
         self.z = zi * 0.0
 
-    def add(self, x):
-        y, self.z = lfilter(self.b, self.a, [x], zi=self.z)
-        return float(y[0])
+    def process_batch(self, x):
+        """Filter a chunk in one lfilter call, carrying state across chunks."""
+        y, self.z = lfilter(self.b, self.a, x, zi=self.z)
+        return y
 
 
 # -----------------------------------------------------
 # Respiration visualiser
 # -----------------------------------------------------
 class RespVisualiser:
-    def __init__(self, queue, buffer_len=20000, ymin=-2, ymax=2):
-        self.queue = queue
-        self.buffer = deque(maxlen=buffer_len)
+    def __init__(self, queue, buffer_len=1000, ymin=-2, ymax=2):
+        # Qt and pyqtgraph are imported here so they load only when the GUI starts
+        from PyQt5 import QtWidgets, QtCore
+        import pyqtgraph as pg
 
-        self.app = QtWidgets.QApplication(sys.argv)
+        self.queue = queue
+        # Mirrored ring buffer: the newest buffer_len samples are always the
+        # contiguous view buf[write:write + buffer_len], so plotting never copies
+        self.size = buffer_len
+        self.buf = np.zeros(2 * buffer_len, dtype=np.float32)
+        self.write = 0
+        self.count = 0
+
+        self.app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
         self.win = pg.GraphicsLayoutWidget(title="RESP Visualiser")
         self.win.resize(900, 300)
         self.win.show()
@@ -73,18 +93,36 @@ class RespVisualiser:
         self.plot.setYRange(ymin, ymax)
         self.plot.disableAutoRange(axis='y')
         self.plot.setLabel('left', 'Amplitude (V)')
-        self.plot.setLabel('bottom', 'Samples')
+        self.plot.setLabel('bottom', 'Points (decimated to ~50 Hz)')
 
         self.timer = QtCore.QTimer()
         self.timer.timeout.connect(self.update)
         self.timer.start(20)
 
     def update(self):
-        while not self.queue.empty():
-            value = self.queue.get_nowait()
-            self.buffer.append(value)
-        if self.buffer:
-            self.curve.setData(np.array(self.buffer))
+        # Single consumer: popleft on a deque is atomic, no lock needed
+        while self.queue:
+            self._append(self.queue.popleft())
+        if self.count < self.size:
+            self.curve.setData(self.buf[:self.count])
+        else:
+            self.curve.setData(self.buf[self.write:self.write + self.size])
+
+    def _append(self, chunk):
+        # Write each sample at i and i + size, wrapping around at the end
+        size = self.size
+        chunk = chunk[-size:]
+        end = self.write + len(chunk)
+        if end <= size:
+            self.buf[self.write:end] = chunk
+            self.buf[self.write + size:end + size] = chunk
+        else:
+            split = size - self.write
+            self.buf[self.write:end] = chunk
+            self.buf[self.write + size:] = chunk[:split]
+            self.buf[:end - size] = chunk[split:]
+        self.write = end % size
+        self.count = min(self.count + len(chunk), size)
 
     def start(self):
         self.app.exec_()
@@ -105,11 +143,32 @@ def map_amp_to_note(x, xmin, xmax, note_min=40, note_max=80):
     return int(round(note))
 
 
+# -----------------------------------------------------
+# Precomputed amplitude → MIDI lookup table
+# -----------------------------------------------------
+LUT_SIZE = 4096
+
+
+def build_amp_lut(mapper, xmin, xmax, **kwargs):
+    """Tabulate mapper(x, xmin, xmax, **kwargs) on LUT_SIZE points over [xmin, xmax]."""
+    grid = np.linspace(xmin, xmax, LUT_SIZE)
+    lut = np.array([mapper(x, xmin, xmax, **kwargs) for x in grid], dtype=np.int16)
+    scale = (LUT_SIZE - 1) / (xmax - xmin) if xmax > xmin else 0.0
+    return lut, scale
+
+
+def lut_lookup(lut, scale, x, xmin):
+    """Map an array of amplitudes through the LUT, returning Python ints."""
+    idx = np.clip(np.rint((x - xmin) * scale).astype(np.intp), 0, LUT_SIZE - 1)
+    return lut[idx].tolist()
+
+
 # ---------------- Ctrl+C safe stop ----------------
 stop_flag = threading.Event()
 
 def signal_handler(sig, frame):
     logging.info("Ctrl+C detected. Stopping...")
+    from PyQt5 import QtWidgets
     stop_flag.set()                  # Inform threads to stop
     QtWidgets.QApplication.quit()    # Close PyQt GUI
     sys.exit(0)                      # Exit script
@@ -117,6 +176,38 @@ def signal_handler(sig, frame):
 signal.signal(signal.SIGINT, signal_handler)
 
 
+# -----------------------------------------------------
+# MIDI output thread
+# -----------------------------------------------------
+def raise_thread_priority():
+    """Best-effort bump of the calling thread's scheduling priority."""
+    try:
+        if sys.platform == "win32":
+            import ctypes
+            kernel32 = ctypes.windll.kernel32
+            kernel32.SetThreadPriority(kernel32.GetCurrentThread(), 2)  # THREAD_PRIORITY_HIGHEST
+        else:
+            priority = os.sched_get_priority_min(os.SCHED_FIFO)
+            os.sched_setscheduler(0, os.SCHED_FIFO, os.sched_param(priority))
+    except (AttributeError, OSError) as e:
+        logging.debug(f"Could not raise MIDI thread priority: {e}")
+
+
+def midi_worker(midi, midi_queue):
+    # Sends (kind, note) events so MIDI I/O never stalls the DSP loop
+    raise_thread_priority()
+    while True:
+        kind, note = midi_queue.get()
+        # Keep the thread alive on send errors, otherwise the bridge blocks on a full queue
+        try:
+            if kind == "note_on":
+                midi.note_on(note)
+            else:
+                midi.note_off(note)
+        except Exception as e:
+            logging.error(f"MIDI {kind} for note {note} failed: {e}")
+
+
 # -----------------------------------------------------
 # Worker thread
 # -----------------------------------------------------
@@ -140,23 +231,29 @@ def bridge_worker(args, vis_queue):
     fs = info.nominal_srate() or 100.0
     logging.info(f"Using stream '{info.name()}', fs={fs:.1f} Hz, channel={args.channel}")
 
+    # Decimate the visualiser stream to its 50 Hz refresh rate
+    vis_decim = max(1, int(fs / 50))
+    vis_offset = 0
+
     filt = RespFilter(fs, cutoff=args.cutoff)
-    midi = MidiOut(args.midi_port)
+    midi = MidiOut(args.midi_port, velocity=args.velocity)
+    midi_queue = queue.Queue(maxsize=256)
+    threading.Thread(target=midi_worker, args=(midi, midi_queue), daemon=True,).start()
 
-    amp_min = None
-    amp_max = None
+    # Running calibration range, kept as NumPy scalars and updated per chunk
+    amp_min = np.float64(np.inf)
+    amp_max = np.float64(-np.inf)
     prev_note = None
     calibration_msg_shown = False
 
     try:
         while True:
-            sample, _ = inlet.pull_sample(timeout=0.0)
-            if sample is None:
-                time.sleep(0.001)
+            samples, _ = inlet.pull_chunk(timeout=0.005, max_samples=64)
+            if not samples:
                 continue
 
-            raw = float(sample[args.channel])
-            filtered = filt.add(raw)
+            raw = np.asarray(samples, dtype=np.float64)[:, args.channel]
+            filtered = filt.process_batch(raw)
 
             now = time.time()
 
@@ -167,35 +264,37 @@ def bridge_worker(args, vis_queue):
                     )
                     calibration_msg_shown = True
 
-                if amp_min is None:
-                    amp_min = filtered
-                    amp_max = filtered
-                else:
-                    amp_min = min(amp_min, filtered)
-                    amp_max = max(amp_max, filtered)
+                amp_min = np.minimum(amp_min, filtered.min())
+                amp_max = np.maximum(amp_max, filtered.max())
 
                 if now - start_time >= calibration_duration:
                     calibrating = False
+                    amp_min, amp_max = float(amp_min), float(amp_max)
+                    note_lut, lut_scale = build_amp_lut(
+                        map_amp_to_note, amp_min, amp_max,
+                        note_min=args.note_low,
+                        note_max=args.note_high
+                    )
                     prev_note = None
                     logging.info(
                         f"Calibration complete: amp_min={amp_min:.3f}, amp_max={amp_max:.3f}"
                     )
 
-            vis_queue.put_nowait(filtered)
+            vis_chunk = filtered[vis_offset::vis_decim]
+            if len(vis_chunk):
+                vis_queue.append(vis_chunk)
+            vis_offset = (vis_offset - len(filtered)) % vis_decim
 
             if not calibrating:
-                note = map_amp_to_note(
-                    filtered, amp_min, amp_max,
-                    note_min=args.note_low,
-                    note_max=args.note_high
-                )
-                if prev_note is None:
-                    prev_note = note
-                    midi.note_on(note, args.velocity)
-                elif note != prev_note:
-                    midi.note_off(prev_note)
-                    midi.note_on(note, args.velocity)
-                    prev_note = note
+                for note in lut_lookup(note_lut, lut_scale, filtered, amp_min):
+                    # Note events are never dropped, so a note_off is always sent
+                    if prev_note is None:
+                        prev_note = note
+                        midi_queue.put(("note_on", note))
+                    elif note != prev_note:
+                        midi_queue.put(("note_off", prev_note))
+                        midi_queue.put(("note_on", note))
+                        prev_note = note
 
     except KeyboardInterrupt:
         logging.info("Stopping respiration bridge...")
@@ -206,7 +305,8 @@ def bridge_worker(args, vis_queue):
 # -----------------------------------------------------
 def main(args):
     logging.basicConfig(level=logging.INFO, format="%(asctime)s: %(message)s")
-    vis_queue = queue.Queue(maxsize=2000)
+    # Bounded deque: when the GUI falls behind the oldest chunks are dropped
+    vis_queue = deque(maxlen=2000)
     vis = RespVisualiser(vis_queue)
     threading.Thread(target=bridge_worker, args=(args, vis_queue), daemon=True,).start()
     vis.start()
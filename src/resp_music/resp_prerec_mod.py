@@ -1,24 +1,26 @@
 import argparse
+import contextlib
+import functools
+import json
 import logging
+import os
+import tempfile
 import threading
 import sys
 import time
-import queue
 from collections import deque
+from pathlib import Path
 
 import numpy as np
 import mido
 from scipy.signal import butter, lfilter, lfilter_zi
 
-from PyQt5 import QtWidgets, QtCore
-import pyqtgraph as pg
-
 
 # -----------------------------------------------------
 # MIDI output handler
 # -----------------------------------------------------
 class MidiOut:
-    def __init__(self, port_name):
+    def __init__(self, port_name, cc=115, channel=0):
         try:
             self.outport = mido.open_output(port_name)
         except IOError as e:
@@ -27,42 +29,58 @@ class MidiOut:
                 f"Available ports: {mido.get_output_names()}"
             ) from e
 
-    def send_cc(self, cc, value, channel=0):
-        self.outport.send(
-            mido.Message(
-                "control_change",
-                control=int(cc),
-                value=int(value),
-                channel=int(channel)
-            )
-        )
+        # Prebuilt messages for every CC value, so sending never allocates
+        self._cc = [
+            mido.Message("control_change", control=int(cc), value=v, channel=int(channel))
+            for v in range(128)
+        ]
+
+    def send_cc(self, value):
+        """Send a MIDI CC message; value must be a Python int (0-127)."""
+        self.outport.send(self._cc[value])
 
 
 # -----------------------------------------------------
 # Respiration low-pass filter
 # -----------------------------------------------------
+@functools.lru_cache(maxsize=16)
+def _design(fs, cutoff, order=2):
+    """Butterworth low-pass coefficients and initial state, cached per design."""
+    nyq = 0.5 * fs
+    norm = cutoff / nyq
+    b, a = butter(order, norm, btype="low")
+    return b, a, lfilter_zi(b, a)
+
+
 class RespFilter:
     def __init__(self, fs, cutoff=1.0):
-        nyq = 0.5 * fs
-        norm = cutoff / nyq
-        self.b, self.a = butter(2, norm, btype="low")
-        zi = lfilter_zi(self.b, self.a)
+        self.b, self.a, zi = _design(float(fs), float(cutoff))
         self.z = zi * 0.0
 
-    def add(self, x):
-        y, self.z = lfilter(self.b, self.a, [x], zi=self.z)
-        return float(y[0])
+    def process_batch(self, x):
+        """Filter a whole array in one lfilter call, carrying state across calls."""
+        y, self.z = lfilter(self.b, self.a, x, zi=self.z)
+        return y
 
 
 # -----------------------------------------------------
 # Respiration visualiser
 # -----------------------------------------------------
 class RespVisualiser:
-    def __init__(self, queue, buffer_len=20000, ymin=-1, ymax=1): # smaller y-axis than live as prerecorded signal has smaller amp range
+    def __init__(self, queue, buffer_len=1000, ymin=-1, ymax=1): # smaller y-axis than live as prerecorded signal has smaller amp range
+        # Qt and pyqtgraph are imported here so they load only when the GUI starts
+        from PyQt5 import QtWidgets, QtCore
+        import pyqtgraph as pg
+
         self.queue = queue
-        self.buffer = deque(maxlen=buffer_len)
+        # Mirrored ring buffer: the newest buffer_len samples are always the
+        # contiguous view buf[write:write + buffer_len], so plotting never copies
+        self.size = buffer_len
+        self.buf = np.zeros(2 * buffer_len, dtype=np.float32)
+        self.write = 0
+        self.count = 0
 
-        self.app = QtWidgets.QApplication(sys.argv)
+        self.app = QtWidgets.QApplication.instance() or QtWidgets.QApplication(sys.argv)
         self.win = pg.GraphicsLayoutWidget(title="RESP Visualiser")
         self.win.resize(900, 300)
         self.win.show()
@@ -73,17 +91,36 @@ class RespVisualiser:
         self.plot.setYRange(ymin, ymax)
         self.plot.disableAutoRange(axis='y')
         self.plot.setLabel('left', 'Amplitude (V)')
-        self.plot.setLabel('bottom', 'Samples')
+        self.plot.setLabel('bottom', 'Points (decimated to ~50 Hz)')
 
         self.timer = QtCore.QTimer()
         self.timer.timeout.connect(self.update)
         self.timer.start(20)
 
     def update(self):
-        while not self.queue.empty():
-            self.buffer.append(self.queue.get_nowait())
-        if self.buffer:
-            self.curve.setData(np.array(self.buffer))
+        # Single consumer: popleft on a deque is atomic, no lock needed
+        while self.queue:
+            self._append(self.queue.popleft())
+        if self.count < self.size:
+            self.curve.setData(self.buf[:self.count])
+        else:
+            self.curve.setData(self.buf[self.write:self.write + self.size])
+
+    def _append(self, chunk):
+        # Write each sample at i and i + size, wrapping around at the end
+        size = self.size
+        chunk = chunk[-size:]
+        end = self.write + len(chunk)
+        if end <= size:
+            self.buf[self.write:end] = chunk
+            self.buf[self.write + size:end + size] = chunk
+        else:
+            split = size - self.write
+            self.buf[self.write:end] = chunk
+            self.buf[self.write + size:] = chunk[:split]
+            self.buf[:end - size] = chunk[split:]
+        self.write = end % size
+        self.count = min(self.count + len(chunk), size)
 
     def start(self):
         self.app.exec_()
@@ -93,11 +130,74 @@ class RespVisualiser:
 # Map respiration amplitude → MIDI CC
 # -----------------------------------------------------
 def map_amp_to_cc(x, xmin, xmax):
+    # Vectorised over the whole recording: returns one CC value per sample
+    x = np.asarray(x, dtype=np.float64)
     if xmax <= xmin:
-        return 0
-    frac = (x - xmin) / (xmax - xmin)
-    frac = np.clip(frac, 0.0, 1.0)
-    return int(round(frac * 127))
+        return np.zeros(x.shape, dtype=np.uint8)
+    frac = np.clip((x - xmin) / (xmax - xmin), 0.0, 1.0)
+    return np.rint(frac * 127).astype(np.uint8)
+
+
+# -----------------------------------------------------
+# Load prerecorded respiration CSV
+# -----------------------------------------------------
+def _csv_signature(csv_path):
+    # Size and mtime of the source CSV, stored next to the cache to detect staleness
+    stat = csv_path.stat()
+    return {"size": stat.st_size, "mtime_ns": stat.st_mtime_ns}
+
+
+def _load_cache(npy_path, meta_path, signature):
+    """Return the cached array, or None if it is missing, stale or unreadable."""
+    if not (npy_path.exists() and meta_path.exists()):
+        return None
+    try:
+        if json.loads(meta_path.read_text()) != signature:
+            return None
+        return np.load(npy_path, mmap_mode="r")
+    except (OSError, ValueError, EOFError) as e:
+        logging.warning(f"Ignoring unreadable cache '{npy_path}': {e}")
+        return None
+
+
+def _atomic_write(path, write):
+    # Write to a temporary file in the same directory, then os.replace it into
+    # place, so a failed write never leaves a truncated file at the final path
+    fd, tmp_path = tempfile.mkstemp(dir=path.parent, prefix=path.name, suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        with contextlib.suppress(OSError):
+            os.remove(tmp_path)
+        raise
+
+
+def load_resp_csv(path):
+    """Load the first CSV column, cached as a sibling .npy file for later runs."""
+    csv_path = Path(path)
+    npy_path = csv_path.with_suffix(".npy")
+    meta_path = csv_path.with_suffix(".npy.json")
+    signature = _csv_signature(csv_path)
+
+    data = _load_cache(npy_path, meta_path, signature)
+    if data is not None:
+        return data
+
+    try:
+        import pandas as pd
+    except ImportError:  # pandas is optional; loadtxt is slower but equivalent
+        data = np.loadtxt(csv_path, delimiter=',', skiprows=1, usecols=0)
+    else:
+        data = pd.read_csv(csv_path, usecols=[0], dtype=np.float64, engine="c").to_numpy().ravel()
+
+    try:
+        _atomic_write(npy_path, lambda f: np.save(f, data))
+        _atomic_write(meta_path, lambda f: f.write(json.dumps(signature).encode()))
+    except OSError as e:
+        logging.warning(f"Could not cache '{npy_path}': {e}")
+    return data
 
 
 # -----------------------------------------------------
@@ -105,17 +205,17 @@ def map_amp_to_cc(x, xmin, xmax):
 # -----------------------------------------------------
 def bridge_worker(args, vis_queue):
     logging.info(f"Loading prerecorded respiration from '{args.input_file}'...")
-    data = np.loadtxt(args.input_file, delimiter=',', skiprows=1)
+    data = load_resp_csv(args.input_file)
 
     fs = args.sampling_rate
     dt = 1.0 / fs
 
     filt = RespFilter(fs, cutoff=args.cutoff)
-    midi = MidiOut(args.midi_port)
+    midi = MidiOut(args.midi_port, cc=args.cc, channel=args.channel_midi)
 
     # ---- GLOBAL CALIBRATION ----
     logging.info("PLEASE WAIT: Calibrating amplitude range of RESP signal...")
-    filtered_data = np.array([filt.add(float(x)) for x in data])
+    filtered_data = filt.process_batch(data.astype(np.float64, copy=False))
     amp_min = float(np.min(filtered_data))
     amp_max = float(np.max(filtered_data))
 
@@ -123,15 +223,34 @@ def bridge_worker(args, vis_queue):
         f"Calibration complete: amp_min={amp_min:.3f}, amp_max={amp_max:.3f}"
     )
 
+    cc_list = map_amp_to_cc(filtered_data, amp_min, amp_max).tolist()
+
+    # CC decisions are made on a 100 Hz tick and only sent when the value
+    # changes, sleeping to absolute deadlines so timing does not drift
+    n = len(filtered_data)
+    tick = max(1, int(fs / 100))  # samples per 100 Hz tick
+    vis_decim = max(1, int(fs / 50))  # visualiser refreshes at 50 Hz
+    wake_idx = np.append(np.arange(0, n, tick), n)
+
+    last_cc = None
+    pushed = 0
+
     # ---- PLAYBACK ----
     try:
-        for filtered in filtered_data:
-            vis_queue.put_nowait(filtered)
+        t0 = time.monotonic()
+        for i in wake_idx.tolist():
+            delay = t0 + i * dt - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
 
-            cc_value = map_amp_to_cc(filtered, amp_min, amp_max)
-            midi.send_cc(args.cc, cc_value, channel=args.channel_midi)
+            vis_chunk = filtered_data[pushed:i:vis_decim]
+            if len(vis_chunk):
+                vis_queue.append(vis_chunk)
+                pushed += len(vis_chunk) * vis_decim
 
-            time.sleep(dt)
+            if i < n and cc_list[i] != last_cc:
+                last_cc = cc_list[i]
+                midi.send_cc(last_cc)
 
     except KeyboardInterrupt:
         logging.info("Stopping MIDI CC playback...")
@@ -142,7 +261,8 @@ def bridge_worker(args, vis_queue):
 # -----------------------------------------------------
 def main(args):
     logging.basicConfig(level=logging.INFO, format="%(asctime)s: %(message)s")
-    vis_queue = queue.Queue(maxsize=2000)
+    # Bounded deque: when the GUI falls behind the oldest chunks are dropped
+    vis_queue = deque(maxlen=2000)
     vis = RespVisualiser(vis_queue)
     threading.Thread(target=bridge_worker, args=(args, vis_queue), daemon=True,).start()
     vis.start()